@@ -1,83 +1,176 @@
+import functools
+import sqlite3
+from collections import defaultdict
+from pathlib import Path
+
+
+@functools.lru_cache(maxsize=1024)
+def _valid_name(item_name: str) -> bool:
+    """Cached check for item names (more than 2 characters and only letters)."""
+    return item_name.isalpha() and len(item_name) > 2
+
+
 class User:
+    # Emptied borrowed_items dicts kept for reuse by new users
+    _dict_pool = []
+    _dict_pool_size = 64
+
     def __init__(self, name: str) -> None:
         self.name = name
-        self.borrowed_items = {}
+        self.borrowed_items = User._dict_pool.pop() if User._dict_pool else defaultdict(int)
+
+    def release(self) -> None:
+        """Hand the user's emptied borrowed items back to the pool.
+
+        The dict may be reused by another user, so this user is detached from it
+        and must be discarded: borrow_item/return_item raise TypeError afterwards.
+        """
+        if not self.borrowed_items and len(User._dict_pool) < User._dict_pool_size:
+            User._dict_pool.append(self.borrowed_items)
+        self.borrowed_items = None
 
     def borrow_item(self, item_name: str, quantity: int) -> None:
         """Add an item to the user's borrowed items."""
-        if item_name in self.borrowed_items:
-            self.borrowed_items[item_name] += quantity
-        else:
-            self.borrowed_items[item_name] = quantity
+        self.borrowed_items[item_name] += quantity
 
     def return_item(self, item_name: str, quantity: int) -> bool:
         """Return an item from the user's borrowed items."""
-        if item_name in self.borrowed_items:
-            if self.borrowed_items[item_name] >= quantity:
-                self.borrowed_items[item_name] -= quantity
-                if self.borrowed_items[item_name] == 0:
-                    del self.borrowed_items[item_name]
-                return True
+        borrowed = self.borrowed_items.get(item_name)
+        if borrowed is not None and borrowed >= quantity:
+            if borrowed == quantity:
+                del self.borrowed_items[item_name]
+            else:
+                self.borrowed_items[item_name] = borrowed - quantity
+            return True
         return False
 
     def __str__(self) -> str:
         """String representation of the user."""
-        return f"User: {self.name}, Borrowed Items: {self.borrowed_items}"
+        return self.name
+
+    def describe(self) -> str:
+        """Verbose description of the user and their borrowed items."""
+        return f"User: {self.name}, Borrowed Items: {dict(self.borrowed_items)}"
 
 class InventorySystem:
+    # Statements shared by the save, log and import paths
+    SAVE_ITEM_SQL = "INSERT OR REPLACE INTO inventory (name, qty) VALUES (?, ?)"
+    LOG_TRANSACTION_SQL = "INSERT INTO transactions (action, borrower, item, qty) VALUES (?, ?, ?, ?)"
+
     def __init__(self) -> None:
         self.inventory = {}
         self.users = {}
+        # Sorted inventory views, keyed by (view choice, inventory version)
+        self._inv_version = 0
+        self._sorted_cache = {}
+        # Changes made by a menu option, written in one transaction once it returns
+        self._pending_items = set()
+        self._pending_log = []
+        self.db = sqlite3.connect("inventory.db")
+        self.create_tables()
         self.load_inventory()
         self.load_transactions()
 
+    def create_tables(self) -> None:
+        """Create the inventory and transactions tables if they do not exist."""
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS inventory "
+                            "(name TEXT PRIMARY KEY, qty INTEGER NOT NULL)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS transactions "
+                            "(id INTEGER PRIMARY KEY, action TEXT NOT NULL, borrower TEXT NOT NULL, "
+                            "item TEXT NOT NULL, qty INTEGER NOT NULL)")
+
     def load_inventory(self) -> None:
-        """Load inventory from a text file."""
-        try:
-            with open("inventory.txt", "r") as file:
-                for line in file:
-                    item_name, quantity = line.strip().split(": ")
-                    self.inventory[item_name] = int(quantity)
+        """Load inventory from the database."""
+        self.inventory.update(self.db.execute("SELECT name, qty FROM inventory"))
+        if self.inventory:
             print("Inventory loaded successfully.")
+        else:
+            self.import_inventory()
+
+    def import_inventory(self) -> None:
+        """Import inventory from the legacy text file into the database."""
+        try:
+            data = Path("inventory.txt").read_text()
+            for line in data.splitlines():
+                item_name, quantity = line.split(": ", 1)
+                self.inventory[item_name] = int(quantity)
+            with self.db:
+                self.db.executemany(self.SAVE_ITEM_SQL, self.inventory.items())
+            print("Inventory imported from inventory.txt.")
         except FileNotFoundError:
             print("No inventory file found. Starting with an empty inventory.")
         except ValueError as e:
+            self.inventory.clear()
             print(f"Error loading inventory data: {e}. Starting with an empty inventory.")
 
-    def save_inventory(self) -> None:
-        """Save inventory to a text file."""
-        with open("inventory.txt", "w") as file:
-            for item_name, quantity in self.inventory.items():
-                file.write(f"{item_name}: {quantity}\n")
-        print("Inventory saved successfully.")
+    def save_inventory(self, *item_names: str) -> None:
+        """Queue the given items to be saved to the database by the next flush."""
+        self._pending_items.update(item_names)
+
+    def flush(self) -> None:
+        """Write pending changes to the database in one transaction."""
+        if not (self._pending_items or self._pending_log):
+            return
+        with self.db:
+            self.db.executemany(self.LOG_TRANSACTION_SQL, self._pending_log)
+            self.db.executemany(self.SAVE_ITEM_SQL,
+                                ((item_name, self.inventory[item_name]) for item_name in self._pending_items))
+        self._pending_items.clear()
+        self._pending_log.clear()
 
-    def log_transaction(self, action: str, borrower_name: str, 
+    def log_transaction(self, action: str, borrower_name: str,
                         item_name: str, quantity: int) -> None:
-        """Log lending transactions."""
-        with open("transaction_log.txt", "a") as log_file:
-            log_file.write(f"{action} | {borrower_name} | {item_name} | {quantity}\n")
+        """Log lending transactions (written together with the inventory changes by the next flush)."""
+        self._pending_log.append((action, borrower_name, item_name, quantity))
+
+    def replay_transaction(self, action: str, borrower_name: str,
+                           item_name: str, quantity: int) -> None:
+        """Apply a logged transaction to the users without modifying inventory."""
+        if action != "Lend":
+            return
+        user = self.users.get(borrower_name) or self.users.setdefault(borrower_name, User(borrower_name))
+        user.borrow_item(item_name, quantity)
 
     def load_transactions(self) -> None:
-        """Load transactions from the log file without modifying inventory."""
+        """Load transactions from the database without modifying inventory."""
+        transactions = self.db.execute("SELECT action, borrower, item, qty FROM transactions").fetchall()
+        if not transactions:
+            self.import_transactions()
+            return
+        for action, borrower_name, item_name, quantity in transactions:
+            self.replay_transaction(action, borrower_name, item_name, quantity)
+        print("Transactions loaded successfully.")
+
+    def import_transactions(self) -> None:
+        """Import transactions from the legacy log file into the database."""
+        transactions = []
         try:
             with open("transaction_log.txt", "r") as log_file:
-                for line in log_file:
-                    action, borrower_name, item_name, quantity = line.strip().split(" | ")
-                    quantity = int(quantity)
-                    if borrower_name not in self.users:
-                        self.users[borrower_name] = User(borrower_name)
-                    if action == "Lend":
-                        self.users[borrower_name].borrow_item(item_name, quantity)
-            print("Transactions loaded successfully.")
+                for line_number, line in enumerate(log_file, start=1):
+                    parts = line.rstrip("\n").split(" | ", 3)
+                    if len(parts) != 4:
+                        continue
+                    action, borrower_name, item_name, quantity = parts
+                    try:
+                        transactions.append((action, borrower_name, item_name, int(quantity)))
+                    except ValueError as e:
+                        print(f"Error loading transaction data on line {line_number}: {e}. Skipping it.")
         except FileNotFoundError:
             print("No transaction log file found. Starting with an empty transaction history.")
-        except ValueError as e:
-            print(f"Error loading transaction data: {e}.")
+            return
+        with self.db:
+            self.db.executemany(self.LOG_TRANSACTION_SQL, transactions)
+        for action, borrower_name, item_name, quantity in transactions:
+            self.replay_transaction(action, borrower_name, item_name, quantity)
+        print("Transactions imported from transaction_log.txt.")
 
     def is_valid_item_name(self, item_name: str) -> bool:
         """Check if the item name is valid (more than 2 characters and contains only letters)."""
         assert isinstance(item_name, str), "Item name must be a string."
-        return item_name.isalpha() and len(item_name) > 2
+        return _valid_name(item_name)
 
     def add_item(self) -> None:
         """Add an item to the inventory."""
@@ -94,15 +187,28 @@ class InventorySystem:
                     self.inventory[item_name] += item_quantity
                 else:
                     self.inventory[item_name] = item_quantity
+                self._inv_version += 1
                 print(f"\nAdded {item_quantity} of {item_name} to the inventory.")
                 # Save inventory after adding an item
-                self.save_inventory()
+                self.save_inventory(item_name)
                 break
             except ValueError:
                 print("Please enter a valid integer for quantity.")
             except AssertionError as e:
                 print(e)
 
+    def sorted_inventory(self, choice: str) -> list:
+        """Return the inventory items sorted for a view option, cached until the next change."""
+        key = (choice, self._inv_version)
+        if key not in self._sorted_cache:
+            if choice == '2':
+                items = sorted(self.inventory.items(), key=lambda x: x[0].lower())
+            else:
+                items = sorted(self.inventory.items(), key=lambda x: x[1], reverse=True)
+            self._sorted_cache = {k: v for k, v in self._sorted_cache.items() if k[1] == self._inv_version}
+            self._sorted_cache[key] = items
+        return self._sorted_cache[key]
+
     def view_inventory(self):
         """View the current inventory in different formats."""
         print("\nChoose how you want to view the inventory:")
@@ -130,8 +236,8 @@ class InventorySystem:
             if not self.inventory:
                 print("The inventory is empty.")
             else:
-                for index, item in enumerate(sorted(self.inventory.keys(), key=lambda x: x.lower()), start=1):
-                    print(f"{index}. {item}: {self.inventory[item]}")
+                for index, (item, quantity) in enumerate(self.sorted_inventory(choice), start=1):
+                    print(f"{index}. {item}: {quantity}")
             print("===============================")
         
         elif choice == '3':
@@ -141,8 +247,7 @@ class InventorySystem:
             if not self.inventory:
                 print("The inventory is empty.")
             else:
-                for index, (item, quantity) in enumerate(sorted(self.inventory.items(), 
-                    key=lambda x: x[1], reverse=True), start=1):
+                for index, (item, quantity) in enumerate(self.sorted_inventory(choice), start=1):
                     print(f"{index}. {item}: {quantity}")
             print("===============================")
         
@@ -152,39 +257,40 @@ class InventorySystem:
     def lend_item(self) -> None:
         """Lend an item from the inventory."""
         borrower_name = input("Enter your name: ").strip()
-        if borrower_name not in self.users:
-            self.users[borrower_name] = User(borrower_name)
 
-        available_items = {key.lower(): value for key, value in self.inventory.items() if value > 0}
-        if not available_items:
+        # Item names are already stored lowercased, so filter the pairs directly
+        items = [(key, value) for key, value in self.inventory.items() if value > 0]
+        if not items:
             print("No items available for lending.")
             return
 
         print("\nAvailable items for lending:")
-        for index, (item_name, quantity) in enumerate(available_items.items()):
+        for index, (item_name, quantity) in enumerate(items):
             print(f"{index + 1}. {item_name}: {quantity}")
 
         try:
             item_index = int(input("Select the item number you want to lend: ")) - 1
-            if item_index < 0 or item_index >= len(available_items):
+            if item_index < 0 or item_index >= len(items):
                 print("Invalid selection. Please try again.")
                 return
-            
-            chosen_item = list(available_items.keys())[item_index]
-            available_quantity = available_items[chosen_item]
+
+            chosen_item, available_quantity = items[item_index]
             lend_quantity = int(input(f"How many of {chosen_item} do you want to lend? "))
             
             if lend_quantity <= 0 or lend_quantity > available_quantity:
                 print("Invalid quantity selected.")
                 return
 
-            self.users[borrower_name].borrow_item(chosen_item, lend_quantity)
+            # Only create the borrower once the lend has succeeded
+            user = self.users.get(borrower_name) or self.users.setdefault(borrower_name, User(borrower_name))
+            user.borrow_item(chosen_item, lend_quantity)
             self.inventory[chosen_item] -= lend_quantity
+            self._inv_version += 1
             print(f"Lent {lend_quantity} of {chosen_item} to {borrower_name}.")
 
             self.log_transaction("Lend", borrower_name, chosen_item, lend_quantity)
 
-            self.save_inventory()
+            self.save_inventory(chosen_item)
 
         except ValueError:
             print("Please enter a valid integer.")
@@ -202,28 +308,35 @@ class InventorySystem:
         if user.borrowed_items:
             print("\nItems you have borrowed:")
             
-            for index, (item_name, quantity) in enumerate(user.borrowed_items.items(), start=1):
+            items = list(user.borrowed_items.items())
+            for index, (item_name, quantity) in enumerate(items, start=1):
                 print(f"{index}. {item_name}: {quantity}")
-            
+
             try:
                 item_index = int(input("Select the number of the item you want to return: ")) - 1
-                
-                if item_index < 0 or item_index >= len(user.borrowed_items):
+
+                if item_index < 0 or item_index >= len(items):
                     print("Invalid selection. Please try again.")
                     return
-                
-                chosen_item = list(user.borrowed_items.keys())[item_index]
+
+                chosen_item = items[item_index][0]
                 
                 return_quantity = int(input(f"How many of {chosen_item} do you want to return? "))
                 
                 if user.return_item(chosen_item, return_quantity):
                     self.inventory[chosen_item] += return_quantity
+                    self._inv_version += 1
                     print(f"Returned {return_quantity} of {chosen_item} from {borrower_name}.")
                     
                     self.log_transaction("Return", borrower_name, chosen_item, return_quantity)
-                    
-                    self.save_inventory()
-                
+
+                    self.save_inventory(chosen_item)
+
+                    # Drop users with nothing left borrowed and recycle their dict
+                    if not user.borrowed_items:
+                        del self.users[borrower_name]
+                        user.release()
+
                 else:
                     print(f"You do not have enough of {chosen_item} to return.")
             
@@ -259,10 +372,11 @@ class InventorySystem:
                 old_quantity = self.inventory[item_name]
                 
                 self.inventory[item_name] = new_quantity
+                self._inv_version += 1
                 
                 print(f"Updated {item_name} from {old_quantity} to {new_quantity}.")
-                
-                self.save_inventory()
+
+                self.save_inventory(item_name)
             
             except ValueError:
                 print("Please enter a valid integer for quantity.")
@@ -276,13 +390,13 @@ class InventorySystem:
             item_name = input("Enter the item name (or type 'done' to finish): ").strip().lower()
             if item_name == "done":
                 break
-            
+
             while not self.is_valid_item_name(item_name):
                 print("Invalid Item Name! Please enter a name without numbers or special characters.")
                 item_name = input("Enter The Item Name (or Type 'done' To Finish): ").strip().lower()
                 if item_name == "done":
                     return
-            
+
             try:
                 item_quantity = int(input("Enter The Quantity: "))
                 assert item_quantity > 0, "Quantity Must Be A Positive Integer."
@@ -295,9 +409,11 @@ class InventorySystem:
                 else:
                     self.inventory[item_name] = item_quantity
                     print(f"Added New Item '{item_name}' With Quantity Of {item_quantity}.")
-                
-                self.save_inventory()
-                
+
+                self._inv_version += 1
+                # Queued items are written together by the next flush
+                self.save_inventory(item_name)
+
             except ValueError:
                 print("Please Enter A Valid Integer For Quantity.")
             except AssertionError as e:
@@ -305,42 +421,50 @@ class InventorySystem:
 
     def main_menu(self) -> None:
         """Display The Main Menu And Handle User Choices."""
-        while True:
-            options = [
-                "1. Add Item",
-                "2. View Inventory",
-                "3. Lend Item",
-                "4. Return Item",
-                "5. View Lending Records",
-                "6. Update Item Quantity",
-                "7. Bulk Add Items",
-                "8. Exit"
-            ]
-            for option in options:
-                print(option)
+        try:
+            while True:
+                options = [
+                    "1. Add Item",
+                    "2. View Inventory",
+                    "3. Lend Item",
+                    "4. Return Item",
+                    "5. View Lending Records",
+                    "6. Update Item Quantity",
+                    "7. Bulk Add Items",
+                    "8. Exit"
+                ]
+                for option in options:
+                    print(option)
             
-            choice = input("\nChoose An Option (1-8): ")
+                choice = input("\nChoose An Option (1-8): ")
             
-            if choice == '1':
-                self.add_item()
-            elif choice == '2':
-                self.view_inventory()
-            elif choice == '3':
-                self.lend_item()
-            elif choice == '4':
-                self.return_item()
-            elif choice == '5':
-                self.view_lending_records()
-            elif choice == '6':
-                self.update_item()
-            elif choice == '7':
-                self.bulk_add_items()
-            elif choice == '8':
-                print("\nExiting The Inventory System.")  # Save Before Exiting.
-                self.save_inventory()
-                break
-            else:
-                print("\nInvalid Choice! Please Choose A Valid Option.")
+                if choice == '1':
+                    self.add_item()
+                elif choice == '2':
+                    self.view_inventory()
+                elif choice == '3':
+                    self.lend_item()
+                elif choice == '4':
+                    self.return_item()
+                elif choice == '5':
+                    self.view_lending_records()
+                elif choice == '6':
+                    self.update_item()
+                elif choice == '7':
+                    self.bulk_add_items()
+                elif choice == '8':
+                    print("\nExiting The Inventory System.")
+                    break
+                else:
+                    print("\nInvalid Choice! Please Choose A Valid Option.")
+
+                self.flush()
+        finally:
+            # Save and close the database however the session ends
+            try:
+                self.flush()
+            finally:
+                self.db.close()
 
 if __name__ == "__main__":
     system = InventorySystem()